@@ -7,13 +7,17 @@
 """
 Recursively processes files in the script's directory:
 - Encrypts each file into a 7z archive with a user-provided password (headers encrypted).
-- Renames the resulting .7z to a file without extension.
-- Wraps that payload in a standard ZIP archive stored alongside the original.
+- Wraps that payload in a standard ZIP archive stored alongside the original, as a single member with a random
+  extension-less name (the .7z is zipped under that name directly, no rename on disk).
 - Does NOT log or print the password (except auto-generated password is printed once).
-- Avoids overwriting existing output ZIPs by generating unique names.
+- Feeds the password to 7z on stdin, so it never appears on the 7z command line.
+- Avoids overwriting existing output ZIPs by generating unique names (reserved atomically, safe across workers).
+- Skips files unchanged since they were last archived (manifest: .zipper_manifest.json; --force re-archives all).
 - Includes an optional self-test mode: --self-test
 - Password entry shows '*' while typing (best-effort; falls back to hidden input where masking isn't possible).
-- Console shows current file being processed in the progress bar postfix (name + %).
+- Files are processed concurrently (--jobs N, default: half the CPU count; --processes uses worker processes).
+- Optionally packs small files of one directory into a single archive (--group-small SIZE).
+- Console shows the most recently finished file in the progress bar postfix (name + %).
 """
 
 import os
@@ -26,11 +30,68 @@ import secrets
 import string
 import subprocess
 import zipfile
+import io
+import json
+import hashlib
 import tempfile
 import argparse
+import collections
+import math
+import atexit
+import threading
+import functools
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from typing import BinaryIO, TextIO
 from tqdm import tqdm
 
 
+_log_lock = threading.Lock()
+
+# Open log handles by path (see log_message); flushed every LOG_FLUSH_EVERY lines and closed at exit
+_log_files: dict[str, TextIO] = {}
+_log_pending = 0
+LOG_FLUSH_EVERY = 128
+
+# Manifest of archived files (in the script's directory), used to skip unchanged files on re-runs
+MANIFEST_NAME = ".zipper_manifest.json"
+
+# Output name used (inside the directory) for a --group-small bundle
+GROUP_ZIP_NAME = "small_files.zip"
+
+# How much of each upcoming file --prefetch pulls into the page cache
+PREFETCH_BYTES = 4 << 20
+
+# --backend py7zr builds payloads for inputs below this total size in memory (see encrypt_to_zip)
+IN_MEMORY_PAYLOAD_MAX = 16 << 20
+
+# Jobs at least this big are submitted first, largest first (see schedule_jobs)
+LARGE_JOB = 64 << 20
+
+# Block size for copying the payload into the outer ZIP (see wrap_in_zip)
+ZIP_COPY_CHUNK = 1 << 20
+
+# Files whose first ENTROPY_SAMPLE bytes exceed INCOMPRESSIBLE_BITS bits/byte are stored (see looks_incompressible)
+ENTROPY_SAMPLE = 64 << 10
+INCOMPRESSIBLE_BITS = 7.5
+
+# Inputs below this size get an LZMA2 dictionary sized to fit them (see compression_args)
+LZMA2_SMALL_INPUT = 16 << 20
+
+# Media/archive formats that are already compressed: recompressing them costs CPU for ~0% gain, so they are stored.
+ALREADY_COMPRESSED_EXTS = frozenset({
+    ".jpg", ".jpeg", ".png", ".gif", ".webp", ".heic",
+    ".mp3", ".aac", ".ogg", ".opus", ".flac", ".m4a",
+    ".mp4", ".mkv", ".mov", ".avi", ".webm",
+    ".7z", ".zip", ".rar", ".gz", ".xz", ".bz2", ".zst",
+})
+
+# Archive formats that are never picked up as inputs (avoids re-archiving earlier outputs)
+EXCLUDED_EXTS = frozenset({
+    ".zip", ".7z", ".rar", ".gz", ".xz", ".bz2", ".tar", ".tgz", ".zst",
+})
+
+
 # // ------------------------------------------------------------
 def clear_screen() -> None:
     # Clear terminal for cleaner UX (Windows/Linux/macOS)
@@ -51,9 +112,39 @@ def _safe_open_append_text(log_path: str):
 # // ------------------------------------------------------------
 def log_message(log_path: str, message: str) -> None:
     # Append timestamped log line to log file (no secrets should be logged)
+    # Serialized with a lock so concurrent callers never interleave lines.
+    # The file stays open for the whole run (one open per path, not per line); buffered lines are flushed
+    # every LOG_FLUSH_EVERY lines and on exit (close_logs).
+    global _log_pending
     timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    with _safe_open_append_text(log_path) as logf:
+    with _log_lock:
+        logf = _log_files.get(log_path)
+        if logf is None:
+            logf = _log_files[log_path] = _safe_open_append_text(log_path)
         logf.write(f"[{timestamp}] {message}\n")
+        _log_pending += 1
+        if _log_pending >= LOG_FLUSH_EVERY:
+            for f in _log_files.values():
+                f.flush()
+            _log_pending = 0
+# // ------------------------------------------------------------
+
+
+# // ------------------------------------------------------------
+def close_logs() -> None:
+    # Flush and close every log handle opened by log_message (registered with atexit).
+    global _log_pending
+    with _log_lock:
+        for f in _log_files.values():
+            try:
+                f.close()
+            except OSError:
+                pass
+        _log_files.clear()
+        _log_pending = 0
+
+
+atexit.register(close_logs)
 # // ------------------------------------------------------------
 
 
@@ -196,43 +287,74 @@ def get_password_from_user() -> str:
 # // ------------------------------------------------------------
 
 
+# // ------------------------------------------------------------
+def _walk_files(
+    folder: str,
+    depth: int,
+    max_depth: int | None,
+    exclude_real: frozenset[str],
+    exclude_base: frozenset[str],
+    ext_filter: frozenset[str] | None,
+    ext_exclude: frozenset[str],
+):
+    # Yield regular files under folder using os.scandir (type info comes from the dirent, no per-file stat).
+    # Files of a directory are yielded before descending into its subdirectories (same order as os.walk).
+    try:
+        with os.scandir(folder) as it:
+            entries = list(it)
+    except OSError:
+        return
+
+    if os.name != "nt":
+        # Visit entries in inode order: close to on-disk metadata order on ext4/XFS (fewer seeks on a cold cache).
+        # NTFS has no comparable inode locality, and inode() costs a stat there.
+        entries.sort(key=lambda e: e.inode())
+
+    subdirs: list[str] = []
+    for entry in entries:
+        try:
+            if entry.is_dir(follow_symlinks=False):
+                if max_depth is None or depth < max_depth:
+                    subdirs.append(entry.path)
+                continue
+            if not entry.is_file(follow_symlinks=False):
+                # Symlinks and special files are never archived
+                continue
+        except OSError:
+            continue
+
+        # Exclude this script (and log/manifest); realpath is only resolved for a name match
+        if entry.name in exclude_base and os.path.realpath(entry.path) in exclude_real:
+            continue
+
+        # Extension filters work on the bare entry name (already split from the path, parsed once)
+        ext = os.path.splitext(entry.name)[1].lower()
+        if ext in ext_exclude or (ext_filter is not None and ext not in ext_filter):
+            continue
+
+        yield entry.path
+
+    for sub in subdirs:
+        yield from _walk_files(sub, depth + 1, max_depth, exclude_real, exclude_base, ext_filter, ext_exclude)
+# // ------------------------------------------------------------
+
+
 # // ------------------------------------------------------------
 def get_all_files(
     base_folder: str,
     exclude_filename: str,
     max_depth: int | None = None,
     extensions: list[str] | None = None,
+    exclude_exts: frozenset[str] = frozenset(),
+    extra_excludes: list[str] | None = None,
 ) -> list[str]:
-    # Collect files recursively from base_folder, excluding exclude_filename
-    file_paths: list[str] = []
-    ext_filter = {e.lower() for e in extensions} if extensions is not None else None
-
-    for root, dirs, files in os.walk(base_folder):
-        # Optionally limit recursion depth
-        if max_depth is not None:
-            rel_path = os.path.relpath(root, base_folder)
-            if rel_path != ".":
-                depth = rel_path.count(os.sep) + 1
-                if depth > max_depth:
-                    dirs[:] = []
-                    continue
+    # Collect files recursively from base_folder, excluding exclude_filename (and extra_excludes),
+    # keeping only extensions (if given) and dropping exclude_exts (lowercase, with dot).
+    exclude_real = frozenset(os.path.realpath(p) for p in [exclude_filename, *(extra_excludes or [])])
+    exclude_base = frozenset(os.path.basename(p) for p in exclude_real)
+    ext_filter = frozenset(e.lower() for e in extensions) if extensions is not None else None
 
-        for fname in files:
-            full_path = os.path.join(root, fname)
-
-            # Exclude this script itself (by full path match)
-            if os.path.realpath(full_path) == os.path.realpath(exclude_filename):
-                continue
-
-            # Optionally filter by file extension list
-            if ext_filter is not None:
-                ext = os.path.splitext(fname)[1].lower()
-                if ext not in ext_filter:
-                    continue
-
-            file_paths.append(full_path)
-
-    return file_paths
+    return list(_walk_files(base_folder, 0, max_depth, exclude_real, exclude_base, ext_filter, exclude_exts))
 # // ------------------------------------------------------------
 
 
@@ -275,63 +397,297 @@ def find_7z_executable() -> str | None:
 
 
 # // ------------------------------------------------------------
-def ensure_unique_path(desired_path: str) -> str:
-    # If desired_path exists, create a unique path by appending a numeric suffix. Never deletes existing files.
-    if not os.path.exists(desired_path):
-        return desired_path
-
+def reserve_unique_path(desired_path: str) -> str:
+    # Claim desired_path (or desired_path with a numeric suffix if taken) by creating it empty with O_EXCL.
+    # One syscall per attempt, and atomic: concurrent workers can never pick the same name. Never touches
+    # existing files; the caller overwrites the empty placeholder (or removes it on failure).
     base, ext = os.path.splitext(desired_path)
-    i = 1
+    flags = os.O_CREAT | os.O_EXCL | os.O_WRONLY | getattr(os, "O_BINARY", 0)
+    i = 0
     while True:
-        candidate = f"{base}.{i}{ext}"
-        if not os.path.exists(candidate):
-            return candidate
-        i += 1
+        candidate = desired_path if i == 0 else f"{base}.{i}{ext}"
+        try:
+            fd = os.open(candidate, flags, 0o666)
+        except FileExistsError:
+            i += 1
+            continue
+        os.close(fd)
+        return candidate
 # // ------------------------------------------------------------
 
 
 # // ------------------------------------------------------------
-def encrypt_with_7z(seven_zip_path: str, in_file: str, out_7z_no_ext_path: str, password: str) -> None:
-    """
-    Encrypt a file using 7-Zip into a 7z archive (then rename to no-extension).
-    Creates a temporary .7z first, then moves to final no-extension filename.
+def looks_incompressible(path: str) -> bool:
+    # Cheap sniff for compressed/encrypted content in unknown formats: Shannon entropy of the first
+    # ENTROPY_SAMPLE bytes above INCOMPRESSIBLE_BITS bits/byte (text is ~4-5, compressed data ~7.9+).
+    try:
+        with open(path, "rb") as f:
+            sample = f.read(ENTROPY_SAMPLE)
+    except OSError:
+        return False
+    if not sample:
+        return False
+    n = len(sample)
+    entropy = -sum(c / n * math.log2(c / n) for c in collections.Counter(sample).values())
+    return entropy > INCOMPRESSIBLE_BITS
+# // ------------------------------------------------------------
 
-    Note: -pPASSWORD is passed as a command-line argument (may be visible via process listing on some systems).
+
+# // ------------------------------------------------------------
+def is_stored(in_files: list[str], method: str = "lzma2") -> bool:
+    # Store without compression: requested, or every input is an already-compressed format (by extension,
+    # else by sniffing its head, see looks_incompressible). Encryption still applies.
+    return method == "store" or all(
+        os.path.splitext(f)[1].lower() in ALREADY_COMPRESSED_EXTS or looks_incompressible(f) for f in in_files
+    )
+# // ------------------------------------------------------------
+
+
+# // ------------------------------------------------------------
+def small_dict_size(in_files: list[str], level: int = 5) -> int | None:
+    # LZMA2 presets >= 5 use a >= 16 MiB dictionary (up to 64 MiB at -mx=9), allocated whatever the input size.
+    # For smaller inputs return the next power of two (min 64 KiB): faster coder init and far less RAM per worker.
+    # None means keep the preset's dictionary.
+    if level < 5:
+        return None
+    try:
+        total = sum(os.path.getsize(f) for f in in_files)
+    except OSError:
+        return None
+    if total >= LZMA2_SMALL_INPUT:
+        return None
+    return 1 << max(16, (total - 1).bit_length())
+# // ------------------------------------------------------------
+
+
+# // ------------------------------------------------------------
+def compression_args(in_files: list[str], method: str = "lzma2", level: int = 5) -> list[str]:
+    # 7z method switches for in_files. Already-compressed formats are always stored (-mx=0).
+    if is_stored(in_files, method):
+        return ["-mx=0"]
+    if method == "zstd":
+        # Needs a zstd-capable 7-Zip build (e.g. 7-Zip ZS); mainline 7-Zip rejects -m0=zstd.
+        return ["-m0=zstd", f"-mx={level}"]
+    args = ["-m0=lzma2", f"-mx={level}"]
+    dict_size = small_dict_size(in_files, level)
+    if dict_size is not None:
+        args.append(f"-md={dict_size >> 10}k")
+    return args
+# // ------------------------------------------------------------
+
+
+# // ------------------------------------------------------------
+def run_7z(cmd: list[str], password: str) -> subprocess.CompletedProcess:
+    # Run 7z with a bare -p switch in cmd: 7z then prompts for the password, which is answered on stdin.
+    # The line is sent twice because some 7-Zip builds ask "Verify password" when creating an archive;
+    # an unread second line is simply discarded.
+    # On POSIX the child gets its own session (no controlling terminal): p7zip reads the password via getpass(),
+    # which would otherwise prompt on /dev/tty instead of reading stdin.
+    return subprocess.run(
+        cmd,
+        input=f"{password}\n{password}\n",
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        text=True,
+        start_new_session=os.name != "nt",
+        # Python opens every fd non-inheritable, so the per-spawn close-all-fds scan is unnecessary on POSIX
+        close_fds=os.name == "nt",
+    )
+# // ------------------------------------------------------------
+
+
+# // ------------------------------------------------------------
+@functools.lru_cache(maxsize=None)
+def seven_zip_codecs(seven_zip_path: str) -> str | None:
+    # Upper-cased "7z i" output (formats/codecs list), queried once per executable; None if it can't be run.
+    try:
+        proc = subprocess.run(
+            [seven_zip_path, "i"], stdin=subprocess.DEVNULL, capture_output=True, text=True, errors="replace"
+        )
+    except OSError:
+        return None
+    if proc.returncode != 0:
+        return None
+    return proc.stdout.upper()
+# // ------------------------------------------------------------
+
+
+# // ------------------------------------------------------------
+@functools.lru_cache(maxsize=None)
+def add_cmd_prefix(seven_zip_path: str, threads: int | None) -> tuple[str, ...]:
+    # Constant head of every "7z a" command line, built once per (executable, threads).
+    prefix = (seven_zip_path, "a", "-t7z", "-p", "-mhe=on")
+    if threads is not None:
+        prefix += (f"-mmt={threads}",)
+    return prefix
+# // ------------------------------------------------------------
+
+
+# // ------------------------------------------------------------
+def encrypt_with_7z(
+    seven_zip_path: str,
+    in_files: list[str],
+    out_7z_path: str,
+    password: str,
+    method: str = "lzma2",
+    level: int = 5,
+    threads: int | None = None,
+) -> None:
     """
-    tmp_7z_path = out_7z_no_ext_path + ".7z"
+    Encrypt one or more files using 7-Zip into a 7z archive at out_7z_path (should end in .7z, or 7z appends it).
+    Compression is controlled by method/level (see compression_args); several files form one solid archive.
+    threads caps 7z's own worker threads (-mmt); None leaves 7z's default (all cores).
 
-    cmd = [
-        seven_zip_path,
-        "a",
-        "-t7z",
-        f"-p{password}",
-        "-mhe=on",
-        tmp_7z_path,
-        in_file,
-    ]
+    The password is sent on 7z's stdin (see run_7z), so it is not visible in the process listing.
+    """
+    if os.path.lexists(out_7z_path):
+        # 7z "a" would add into an existing archive instead of replacing it.
+        raise RuntimeError(f"Refusing to reuse existing path: {out_7z_path}")
+
+    cmd = [*add_cmd_prefix(seven_zip_path, threads), *compression_args(in_files, method, level)]
+    if len(in_files) > 1:
+        cmd.append("-ms=on")
+
+    list_path = None
+    if len(in_files) > 1:
+        # A --group-small batch can hold thousands of paths: pass them in a UTF-8 list file (@file) so the
+        # command line stays short (Windows caps it at 32K chars).
+        fd, list_path = tempfile.mkstemp(suffix=".lst")
+        with os.fdopen(fd, "w", encoding="utf-8") as lf:
+            lf.write("\n".join(in_files) + "\n")
+        cmd.extend(["-scsUTF-8", out_7z_path, f"@{list_path}"])
+    else:
+        cmd.extend([out_7z_path, *in_files])
 
-    proc = subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    try:
+        proc = run_7z(cmd, password)
+    finally:
+        if list_path is not None:
+            os.remove(list_path)
     if proc.returncode != 0:
         raise RuntimeError(f"7z failed (code {proc.returncode}): {proc.stderr.strip()[:2000]}")
+# // ------------------------------------------------------------
 
-    if os.path.exists(out_7z_no_ext_path):
-        if os.path.islink(out_7z_no_ext_path) or not os.path.isfile(out_7z_no_ext_path):
-            raise RuntimeError(f"Refusing to overwrite non-regular file: {out_7z_no_ext_path}")
-        os.remove(out_7z_no_ext_path)
 
-    os.replace(tmp_7z_path, out_7z_no_ext_path)
+# // ------------------------------------------------------------
+def open_sequential(path: str):
+    # Open path for a single front-to-back read (unbuffered), hinting the access pattern to the OS:
+    # Windows: O_SEQUENTIAL (FILE_FLAG_SEQUENTIAL_SCAN); POSIX: posix_fadvise(SEQUENTIAL) for larger readahead.
+    fd = os.open(path, os.O_RDONLY | getattr(os, "O_BINARY", 0) | getattr(os, "O_SEQUENTIAL", 0))
+    if hasattr(os, "posix_fadvise"):
+        try:
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_SEQUENTIAL)
+        except OSError:
+            pass
+    return open(fd, "rb", buffering=0)
 # // ------------------------------------------------------------
 
 
 # // ------------------------------------------------------------
-def wrap_in_zip(no_ext_7z_path: str, final_zip_path: str) -> None:
-    # Wrap the extension-less encrypted file into a standard ZIP archive.
-    if os.path.islink(no_ext_7z_path) or not os.path.isfile(no_ext_7z_path):
-        raise RuntimeError(f"Refusing to zip non-regular file: {no_ext_7z_path}")
+def wrap_in_zip(payload_path: str, final_zip_path: str, arcname: str | None = None) -> None:
+    # Wrap the encrypted payload into a standard ZIP archive (member name defaults to the payload's basename).
+    # Stored, not deflated: the encrypted 7z payload is incompressible, so deflate would only burn CPU.
+    if os.path.islink(payload_path) or not os.path.isfile(payload_path):
+        raise RuntimeError(f"Refusing to zip non-regular file: {payload_path}")
+
+    if arcname is None:
+        arcname = os.path.basename(payload_path)
+    # Same member metadata as ZipFile.write, but copied in ZIP_COPY_CHUNK blocks (ZipFile.write uses 8 KiB)
+    zinfo = zipfile.ZipInfo.from_file(payload_path, arcname=arcname)
+    zinfo.compress_type = zipfile.ZIP_STORED
+    with zipfile.ZipFile(final_zip_path, "w", compression=zipfile.ZIP_STORED) as zf, \
+            open_sequential(payload_path) as src, zf.open(zinfo, "w") as dst:
+        shutil.copyfileobj(src, dst, ZIP_COPY_CHUNK)
+# // ------------------------------------------------------------
+
 
-    arcname = os.path.basename(no_ext_7z_path)
-    with zipfile.ZipFile(final_zip_path, "w", compression=zipfile.ZIP_DEFLATED) as zf:
-        zf.write(no_ext_7z_path, arcname=arcname)
+# // ------------------------------------------------------------
+def encrypt_with_py7zr(
+    in_files: list[str],
+    out_7z: str | BinaryIO,
+    password: str,
+    method: str = "lzma2",
+    level: int = 5,
+) -> None:
+    """
+    In-process equivalent of encrypt_with_7z using py7zr (optional dependency: pip install py7zr).
+    Same archive layout: AES-256 with encrypted headers, members stored under their base names.
+    Saves the 7z process start-up per job, which dominates for small files; large files are faster with 7z.
+    out_7z is a path, or a seekable binary stream (e.g. io.BytesIO) to build the payload in memory.
+    """
+    try:
+        import py7zr  # type: ignore
+    except ImportError:
+        raise RuntimeError("py7zr backend selected but py7zr is not installed (pip install py7zr)") from None
+
+    if isinstance(out_7z, str) and os.path.lexists(out_7z):
+        raise RuntimeError(f"Refusing to reuse existing path: {out_7z}")
+
+    if is_stored(in_files, method):
+        coder = {"id": py7zr.FILTER_COPY}
+    elif method == "lzma2":
+        coder = {"id": py7zr.FILTER_LZMA2, "preset": level}
+        dict_size = small_dict_size(in_files, level)
+        if dict_size is not None:
+            coder["dict_size"] = dict_size
+    else:
+        raise RuntimeError(f"py7zr backend does not support method {method!r}")
+
+    filters = [coder, {"id": py7zr.FILTER_CRYPTO_AES256_SHA256}]
+    with py7zr.SevenZipFile(out_7z, "w", password=password, header_encryption=True, filters=filters) as z:
+        for f in in_files:
+            z.write(f, arcname=os.path.basename(f))
+# // ------------------------------------------------------------
+
+
+# // ------------------------------------------------------------
+def encrypt_to_zip(
+    seven_zip_path: str | None,
+    in_files: list[str],
+    final_zip_path: str,
+    password: str,
+    method: str = "lzma2",
+    level: int = 5,
+    threads: int | None = None,
+    backend: str = "7z",
+) -> None:
+    """
+    Encrypt in_files with one 7z run and wrap the payload into final_zip_path as a single extension-less member.
+    The .7z scratch payload is written next to the ZIP and zipped under its random name directly
+    (no rename to an extension-less file on disk), then deleted.
+
+    7z cannot write the 7z format to stdout (it seeks back to patch the header), so one on-disk payload remains.
+    backend "py7zr" builds the payload in-process (see encrypt_with_py7zr) instead of running 7z (seven_zip_path
+    is unused and may be None); inputs below
+    IN_MEMORY_PAYLOAD_MAX are then built in memory and written straight into the ZIP, with no payload file at all.
+    """
+    rnd_name = random_name_no_ext()
+
+    if backend == "py7zr":
+        try:
+            in_memory = sum(os.path.getsize(f) for f in in_files) < IN_MEMORY_PAYLOAD_MAX
+        except OSError:
+            in_memory = False
+        if in_memory:
+            buf = io.BytesIO()
+            encrypt_with_py7zr(in_files, buf, password, method, level)
+            zinfo = zipfile.ZipInfo(rnd_name, date_time=datetime.datetime.now().timetuple()[:6])
+            zinfo.external_attr = 0o100644 << 16  # regular file, rw-r--r--
+            with zipfile.ZipFile(final_zip_path, "w", compression=zipfile.ZIP_STORED) as zf:
+                zf.writestr(zinfo, buf.getbuffer())
+            return
+
+    payload_path = os.path.join(os.path.dirname(final_zip_path), rnd_name + ".7z")
+
+    try:
+        if backend == "py7zr":
+            encrypt_with_py7zr(in_files, payload_path, password, method, level)
+        else:
+            encrypt_with_7z(seven_zip_path, in_files, payload_path, password, method, level, threads)
+        wrap_in_zip(payload_path, final_zip_path, arcname=rnd_name)
+    finally:
+        if os.path.isfile(payload_path) and not os.path.islink(payload_path):
+            os.remove(payload_path)
 # // ------------------------------------------------------------
 
 
@@ -356,11 +712,11 @@ def decrypt_7z_payload(seven_zip_path: str, payload_path: str, out_dir: str, pas
         "x",
         "-y",
         "-t7z",
-        f"-p{password}",
+        "-p",
         f"-o{out_dir}",
         payload_path,
     ]
-    proc = subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    proc = run_7z(cmd, password)
     if proc.returncode != 0:
         raise RuntimeError(f"7z decrypt failed (code {proc.returncode}): {proc.stderr.strip()[:2000]}")
 # // ------------------------------------------------------------
@@ -371,8 +727,8 @@ def self_test(seven_zip_path: str) -> int:
     """
     Self-test:
     1) Create temp file with known content
-    2) Encrypt to 7z payload (no ext)
-    3) Wrap into ZIP
+    2) Encrypt to 7z payload and wrap into ZIP
+    3) Check the ZIP holds a single extension-less member
     4) Extract ZIP to get payload
     5) Decrypt payload and verify content matches
     6) Attempt decrypt with wrong password and expect failure
@@ -393,13 +749,14 @@ def self_test(seven_zip_path: str) -> int:
         with open(sample_path, "wb") as f:
             f.write(sample_content)
 
-        payload_no_ext = os.path.join(mid_dir, "payload_no_ext")
-        encrypt_with_7z(seven_zip_path, sample_path, payload_no_ext, test_password)
-
         zip_path = os.path.join(mid_dir, "wrapped.zip")
-        wrap_in_zip(payload_no_ext, zip_path)
+        encrypt_to_zip(seven_zip_path, [sample_path], zip_path, test_password)
 
         extracted_payload = extract_single_member_zip(zip_path, out_dir)
+        if os.path.splitext(extracted_payload)[1]:
+            raise RuntimeError("Self-test failed: zip member has an extension")
+        if os.listdir(mid_dir) != ["wrapped.zip"]:
+            raise RuntimeError("Self-test failed: intermediate payload left behind")
 
         dec_dir = os.path.join(out_dir, "dec")
         os.makedirs(dec_dir, exist_ok=True)
@@ -425,6 +782,246 @@ def self_test(seven_zip_path: str) -> int:
 # // ------------------------------------------------------------
 
 
+# // ------------------------------------------------------------
+def prefetch_file(path: str, nbytes: int = PREFETCH_BYTES) -> None:
+    # Warm the page cache for the head of path before 7z opens it. Best-effort: errors are ignored.
+    # POSIX: posix_fadvise(WILLNEED) queues async kernel readahead and returns at once.
+    # Elsewhere (Windows/macOS): read and discard the bytes on the calling (readahead) thread.
+    try:
+        fd = os.open(path, os.O_RDONLY | getattr(os, "O_BINARY", 0))
+    except OSError:
+        return
+    try:
+        if hasattr(os, "posix_fadvise"):
+            os.posix_fadvise(fd, 0, nbytes, os.POSIX_FADV_WILLNEED)
+        else:
+            remaining = nbytes
+            while remaining > 0:
+                chunk = os.read(fd, min(remaining, 1 << 20))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+# // ------------------------------------------------------------
+
+
+# // ------------------------------------------------------------
+def file_digest(path: str) -> str:
+    # BLAKE2b of the file content, read in 1 MiB chunks (change detection only, not a security primitive).
+    h = hashlib.blake2b(usedforsecurity=False)
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(1 << 20)
+            if not chunk:
+                break
+            h.update(chunk)
+    return h.hexdigest()
+# // ------------------------------------------------------------
+
+
+# // ------------------------------------------------------------
+def load_manifest(manifest_path: str) -> dict[str, dict]:
+    # Read the manifest {source relpath: {"mtime_ns", "size", "zip"[, "blake2b"]}}; missing or corrupt -> empty.
+    try:
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return data if isinstance(data, dict) else {}
+# // ------------------------------------------------------------
+
+
+# // ------------------------------------------------------------
+def manifest_tmp_path(manifest_path: str) -> str:
+    # Scratch file save_manifest writes before renaming it over the manifest
+    return manifest_path + ".tmp"
+# // ------------------------------------------------------------
+
+
+# // ------------------------------------------------------------
+def save_manifest(manifest_path: str, manifest: dict[str, dict]) -> None:
+    # Write the manifest atomically (temp file + os.replace) so an interrupted run never leaves it truncated.
+    # It lists every archived path (like the log), so it is created 0600 on POSIX like the log.
+    # A stale temp file from a killed run is removed first: O_CREAT would keep its old permissions.
+    tmp_path = manifest_tmp_path(manifest_path)
+    try:
+        os.remove(tmp_path)
+    except FileNotFoundError:
+        pass
+    fd = os.open(tmp_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o600)
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, separators=(",", ":"))
+    os.replace(tmp_path, manifest_path)
+# // ------------------------------------------------------------
+
+
+# // ------------------------------------------------------------
+def manifest_key(folder: str, path: str) -> str:
+    # Manifest key for path: its path relative to folder. Walked paths are folder + sep + ..., so slicing
+    # the prefix off is enough; os.path.relpath (which re-normalizes both paths) is only the fallback.
+    prefix = os.path.join(folder, "")
+    if path.startswith(prefix):
+        return path[len(prefix):]
+    return os.path.relpath(path, folder)
+# // ------------------------------------------------------------
+
+
+# // ------------------------------------------------------------
+def is_unchanged(folder: str, path: str, manifest: dict[str, dict], verify: bool = False) -> bool:
+    # True if path was archived before and its size/mtime still match (plus content hash with verify)
+    # and the recorded ZIP still exists. Costs one stat per file; hashing only happens with verify.
+    # With verify, an entry without a hash (manifest from an older version) counts as changed: the current
+    # content says nothing about what went into the recorded ZIP.
+    entry = manifest.get(manifest_key(folder, path))
+    if not isinstance(entry, dict):
+        return False
+    try:
+        st = os.stat(path)
+        if st.st_mtime_ns != entry.get("mtime_ns") or st.st_size != entry.get("size"):
+            return False
+        if not os.path.isfile(os.path.join(folder, entry.get("zip", ""))):
+            return False
+        if verify:
+            return "blake2b" in entry and entry["blake2b"] == file_digest(path)
+    except (OSError, TypeError):
+        return False
+    return True
+# // ------------------------------------------------------------
+
+
+# // ------------------------------------------------------------
+def job_label(files: list[str]) -> str:
+    # Log label for a job: the file itself, or a summary of a --group-small batch
+    if len(files) == 1:
+        return files[0]
+    return f"{len(files)} small files in {os.path.dirname(files[0])}"
+# // ------------------------------------------------------------
+
+
+# // ------------------------------------------------------------
+def process_one(
+    files: list[str],
+    password: str,
+    seven_zip_path: str | None,
+    method: str = "lzma2",
+    level: int = 5,
+    threads: int | None = None,
+    backend: str = "7z",
+) -> tuple[bool, str, dict[str, dict]]:
+    # Encrypt + wrap one job: a single file, or a group of small files from one directory (see group_small_files).
+    # Runs in a worker thread or process (top-level so it pickles); returns (ok, log line, manifest entries)
+    # so the caller does all logging and manifest bookkeeping. Entries are keyed by absolute source path;
+    # sources are stat'ed and hashed before encryption (the hash is what --verify compares against later),
+    # so a file changed mid-run is archived again next time.
+    label = job_label(files)
+    if len(files) == 1:
+        desired_zip = files[0] + ".zip"
+    else:
+        desired_zip = os.path.join(os.path.dirname(files[0]), GROUP_ZIP_NAME)
+
+    final_zip_path = None
+    ok = False
+    try:
+        entries: dict[str, dict] = {}
+        for f in files:
+            st = os.stat(f)
+            entries[f] = {"mtime_ns": st.st_mtime_ns, "size": st.st_size, "blake2b": file_digest(f)}
+
+        final_zip_path = reserve_unique_path(desired_zip)
+
+        encrypt_to_zip(seven_zip_path, files, final_zip_path, password, method, level, threads, backend)
+
+        for entry in entries.values():
+            entry["zip"] = final_zip_path
+        ok = True
+        return True, f"Success: {label} -> {final_zip_path}", entries
+
+    except Exception as e:
+        return False, f"Error: {label} | {repr(e)}", {}
+
+    finally:
+        if not ok and final_zip_path is not None:
+            # Drop the reserved name (empty placeholder or partial ZIP); it was created by this job.
+            # In finally so it also runs on KeyboardInterrupt (--processes workers get SIGINT too).
+            try:
+                os.remove(final_zip_path)
+            except OSError:
+                pass
+# // ------------------------------------------------------------
+
+
+# // ------------------------------------------------------------
+def group_small_files(files: list[str], max_size: int | None) -> list[list[str]]:
+    # Split files into jobs: files smaller than max_size that share a directory are packed into one job
+    # (one 7z run, one ZIP); everything else is its own job. max_size=None disables grouping.
+    if max_size is None:
+        return [[f] for f in files]
+
+    jobs: list[list[str]] = []
+    groups: dict[str, list[str]] = {}
+    for f in files:
+        try:
+            small = os.path.getsize(f) < max_size
+        except OSError:
+            small = False
+        if small:
+            groups.setdefault(os.path.dirname(f), []).append(f)
+        else:
+            jobs.append([f])
+
+    jobs.extend(groups.values())
+    return jobs
+# // ------------------------------------------------------------
+
+
+# // ------------------------------------------------------------
+def schedule_jobs(jobs: list[list[str]], large: int = LARGE_JOB) -> list[list[str]]:
+    # Submission order: jobs of >= large bytes first, biggest first, so a multi-GB file never starts last and
+    # leaves the other workers idle; the rest keep walk order (inode order per directory, for disk locality).
+    sized: list[tuple[int, list[str]]] = []
+    rest: list[list[str]] = []
+    for job in jobs:
+        try:
+            size = sum(os.path.getsize(f) for f in job)
+        except OSError:
+            size = 0
+        if size >= large:
+            sized.append((size, job))
+        else:
+            rest.append(job)
+    sized.sort(key=lambda t: t[0], reverse=True)
+    return [job for _, job in sized] + rest
+# // ------------------------------------------------------------
+
+
+# // ------------------------------------------------------------
+def parse_size(text: str) -> int:
+    # argparse type: byte count with optional k/m/g suffix (binary units), e.g. "512k"
+    units = {"k": 1 << 10, "m": 1 << 20, "g": 1 << 30}
+    t = text.strip().lower()
+    mult = units.get(t[-1:], 1)
+    if mult != 1:
+        t = t[:-1]
+    try:
+        value = int(t) * mult
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid size: {text!r}") from None
+    if value < 1:
+        raise argparse.ArgumentTypeError(f"size must be positive: {text!r}")
+    return value
+# // ------------------------------------------------------------
+
+
+# // ------------------------------------------------------------
+def default_jobs() -> int:
+    # Half the logical CPUs: each 7z run is itself multi-threaded, so this leaves headroom (SMT siblings) per worker.
+    return max(1, (os.cpu_count() or 1) // 2)
+# // ------------------------------------------------------------
+
+
 # // ------------------------------------------------------------
 def parse_args(argv: list[str]) -> argparse.Namespace:
     # Parse command-line arguments
@@ -432,7 +1029,68 @@ def parse_args(argv: list[str]) -> argparse.Namespace:
     p.add_argument("--self-test", action="store_true", help="Run built-in self-test and exit")
     p.add_argument("--depth", type=int, default=2, help="Max recursion depth (default: 2)")
     p.add_argument("--no-clear", action="store_true", help="Do not clear screen on start")
-    return p.parse_args(argv)
+    p.add_argument("--force", action="store_true", help="Re-archive files even if unchanged since the last run")
+    p.add_argument(
+        "--verify",
+        action="store_true",
+        help="Also compare content hashes (not just size/mtime) before skipping an unchanged file",
+    )
+    p.add_argument(
+        "--jobs",
+        type=int,
+        default=default_jobs(),
+        help="Max files encrypted concurrently (default: half the CPU count)",
+    )
+    p.add_argument(
+        "--processes",
+        action="store_true",
+        help="Run the --jobs workers as processes instead of threads",
+    )
+    p.add_argument(
+        "--method",
+        choices=("lzma2", "zstd", "store"),
+        default="lzma2",
+        help="7z compression method (default: lzma2; zstd needs a zstd-capable 7-Zip build)",
+    )
+    p.add_argument(
+        "--backend",
+        choices=("7z", "py7zr"),
+        default="7z",
+        help="Build the 7z payload with the 7z executable (default) or in-process with py7zr (no spawn per job)",
+    )
+    p.add_argument(
+        "--level",
+        type=int,
+        choices=range(10),
+        default=5,
+        metavar="0-9",
+        help="7z compression level (default: 5)",
+    )
+    p.add_argument(
+        "--prefetch",
+        type=int,
+        default=0,
+        metavar="K",
+        help="Warm the page cache for the next K queued files (default: 0 = off; 8-32 works well)",
+    )
+    p.add_argument(
+        "--group-small",
+        type=parse_size,
+        default=None,
+        metavar="SIZE",
+        help=f"Pack files smaller than SIZE (e.g. 256k, 1m) from the same directory into one {GROUP_ZIP_NAME}",
+    )
+    args = p.parse_args(argv)
+    if args.jobs < 1:
+        p.error("--jobs must be >= 1")
+    if args.processes and os.name == "nt" and args.jobs > 61:
+        # ProcessPoolExecutor limit on Windows (WaitForMultipleObjects)
+        p.error("--jobs must be <= 61 with --processes on Windows")
+    if args.prefetch < 0:
+        p.error("--prefetch must be >= 0")
+    if args.backend == "py7zr" and args.method == "zstd":
+        p.error("--method zstd is not supported with --backend py7zr")
+    return args
 # // ------------------------------------------------------------
 
 
@@ -448,13 +1106,32 @@ def main() -> int:
     print(f"Script running in directory: {folder}")
 
     log_path = os.path.join(folder, "log.txt")
+    manifest_path = os.path.join(folder, MANIFEST_NAME)
     script_path = os.path.realpath(sys.argv[0])
 
+    # The 7z executable is only needed to encrypt with it and for the self-test (which decrypts with it)
     seven_zip_path = find_7z_executable()
     if not seven_zip_path or not os.path.isfile(seven_zip_path) or not os.access(seven_zip_path, os.X_OK):
+        seven_zip_path = None
+    if seven_zip_path is None and (args.backend == "7z" or args.self_test):
         print("Error: 7-Zip executable not found or inaccessible. Install 7-Zip or add it to your PATH.")
         return 1
 
+    if args.backend == "py7zr" and not args.self_test:
+        # Check once up front instead of failing every job with the same error
+        try:
+            import py7zr  # type: ignore  # noqa: F401
+        except ImportError:
+            print("Error: --backend py7zr needs the py7zr package (pip install py7zr).")
+            return 1
+
+    if args.method == "zstd" and args.backend == "7z" and not args.self_test:
+        # Check once up front instead of failing every job: mainline 7-Zip has no zstd codec
+        codecs = seven_zip_codecs(seven_zip_path)
+        if codecs is not None and "ZSTD" not in codecs:
+            print("Error: this 7-Zip build has no zstd codec. Use a zstd-capable build (e.g. 7-Zip ZS) or --method lzma2.")
+            return 1
+
     if args.self_test:
         try:
             rc = self_test(seven_zip_path)
@@ -467,62 +1144,144 @@ def main() -> int:
     password = get_password_from_user()
     log_message(log_path, "Run started (password not logged).")
 
-    excluded_exts = {
-        ".zip", ".7z", ".rar", ".gz", ".xz", ".bz2", ".tar", ".tgz", ".zst",
-    }
-
-    candidates = get_all_files(folder, exclude_filename=script_path, max_depth=args.depth, extensions=None)
-    all_files = [f for f in candidates if os.path.splitext(f)[1].lower() not in excluded_exts]
-
-    print(f"Total files found: {len(all_files)}\n")
+    # Archives, the log and the manifest (and its temp file) are dropped during the walk, from the already-split entry names
+    all_files = get_all_files(
+        folder,
+        exclude_filename=script_path,
+        max_depth=args.depth,
+        extensions=None,
+        exclude_exts=EXCLUDED_EXTS,
+        extra_excludes=[log_path, manifest_path, manifest_tmp_path(manifest_path)],
+    )
+
+    manifest = load_manifest(manifest_path)
+    skipped = 0
+    if not args.force and manifest:
+        pending = [f for f in all_files if not is_unchanged(folder, f, manifest, args.verify)]
+        skipped = len(all_files) - len(pending)
+        all_files = pending
+
+    print(f"Total files found: {len(all_files) + skipped} | Unchanged (skipped): {skipped}\n")
 
     errors = 0
     successes = 0
 
+    def record(job: list[str], result: tuple[bool, str, dict[str, dict]]) -> None:
+        # Count, log and add to the manifest one finished job (main thread only)
+        nonlocal successes, errors
+        ok, msg, entries = result
+        for src, entry in entries.items():
+            entry["zip"] = manifest_key(folder, entry["zip"])
+            manifest[manifest_key(folder, src)] = entry
+        if ok:
+            successes += len(job)
+        else:
+            errors += len(job)
+        log_message(log_path, msg)
+
+    jobs = schedule_jobs(group_small_files(all_files, args.group_small))
+    queued = [f for job in jobs for f in job]
+
+    # Readahead runs on its own thread, a small window ahead of the files currently being encrypted
+    readahead = ThreadPoolExecutor(max_workers=1) if args.prefetch else None
+    prefetch_end = min(len(queued), args.jobs)
+
+    # Threads suffice (the GIL is released while 7z runs); --processes avoids GIL contention in the
+    # per-job Python work (process spawn setup, zip wrapping) at the cost of worker start-up.
+    executor_cls = ProcessPoolExecutor if args.processes else ThreadPoolExecutor
+    # Split the cores between the concurrent 7z runs instead of letting each one spawn a thread per core.
+    # Only as many runs as there are jobs can be concurrent: a few big files still get all the cores.
+    threads_per_job = max(1, (os.cpu_count() or 1) // max(1, min(args.jobs, len(jobs))))
+
+    futures: dict = {}
+    handled: set = set()
+    interrupted = False
     try:
-        pbar = tqdm(all_files, desc="Encrypting", unit="file")
-        for file_path in pbar:
-            pbar.set_postfix_str(os.path.basename(file_path), refresh=True)
-
-            if os.path.realpath(file_path) == os.path.realpath(log_path):
-                continue
-
+        with executor_cls(max_workers=args.jobs) as ex:
             try:
-                parent_dir = os.path.dirname(file_path)
-
-                rnd_name = random_name_no_ext()
-                out_no_ext_path = os.path.join(parent_dir, rnd_name)
-
-                desired_zip = os.path.join(parent_dir, os.path.basename(file_path) + ".zip")
-                final_zip_path = ensure_unique_path(desired_zip)
-
-                encrypt_with_7z(seven_zip_path, file_path, out_no_ext_path, password)
-                wrap_in_zip(out_no_ext_path, final_zip_path)
+                futures = {
+                    ex.submit(
+                        process_one,
+                        job,
+                        password,
+                        seven_zip_path,
+                        args.method,
+                        args.level,
+                        threads_per_job,
+                        args.backend,
+                    ): job
+                    for job in jobs
+                }
+                if readahead is not None:
+                    for f in queued[prefetch_end:prefetch_end + args.prefetch]:
+                        readahead.submit(prefetch_file, f)
+                    prefetch_end = min(len(queued), prefetch_end + args.prefetch)
+
+                # Redraw at most twice a second; no bar at all when stdout is not a terminal (disable=None)
+                with tqdm(
+                    total=len(all_files), desc="Encrypting", unit="file", mininterval=0.5, disable=None
+                ) as pbar:
+                    for fut in as_completed(futures):
+                        job = futures[fut]
+                        try:
+                            result = fut.result()
+                        except Exception as e:
+                            # process_one reports its own errors; this is the pool failing (e.g. BrokenProcessPool)
+                            result = (False, f"Error: {job_label(job)} | {repr(e)}", {})
+                        record(job, result)
+                        handled.add(fut)
+                        pbar.set_postfix_str(os.path.basename(job[-1]), refresh=False)
+                        pbar.update(len(job))
+
+                        if readahead is not None:
+                            for f in queued[prefetch_end:prefetch_end + len(job)]:
+                                readahead.submit(prefetch_file, f)
+                            prefetch_end = min(len(queued), prefetch_end + len(job))
+            except KeyboardInterrupt:
+                # Drop queued files and wait for the 7z runs already in flight, so their results can be recorded
+                # below. (wait=False here would also make the with-exit skip the wait for a ProcessPoolExecutor.)
+                ex.shutdown(wait=True, cancel_futures=True)
+                raise
+            finally:
+                if readahead is not None:
+                    readahead.shutdown(wait=False, cancel_futures=True)
 
-                if os.path.exists(out_no_ext_path):
-                    if os.path.islink(out_no_ext_path) or not os.path.isfile(out_no_ext_path):
-                        raise RuntimeError(f"Refusing to delete non-regular file: {out_no_ext_path}")
-                    os.remove(out_no_ext_path)
-
-                successes += 1
-                log_message(log_path, f"Success: {file_path} -> {final_zip_path}")
+    except KeyboardInterrupt:
+        interrupted = True
+        # Leaving the executor waited for the jobs in flight: record the ones that finished so their ZIPs
+        # are in the manifest (and log) and the next run does not archive them again.
+        for fut, job in futures.items():
+            if fut in handled or not fut.done() or fut.cancelled() or fut.exception() is not None:
+                continue
+            record(job, fut.result())
 
-            except Exception as e:
-                errors += 1
-                log_message(log_path, f"Error: {file_path} | {repr(e)}")
+    # Save after the executor has shut down, so every finished job is in; on interrupt the next run resumes
+    try:
+        save_manifest(manifest_path, manifest)
+    except OSError as e:
+        log_message(log_path, f"Manifest not saved: {repr(e)}")
 
-    except KeyboardInterrupt:
+    if interrupted:
         log_message(log_path, "Run interrupted by user (KeyboardInterrupt).")
         print("\nInterrupted.")
         return 130
 
-    log_message(log_path, f"Completed. Total candidates: {len(all_files)} | Successes: {successes} | Errors: {errors}")
-    print(f"\nCompleted. Total files: {len(all_files)} | Successes: {successes} | Errors: {errors}")
+    log_message(
+        log_path,
+        f"Completed. Total candidates: {len(all_files)} | Successes: {successes} | Errors: {errors}"
+        f" | Unchanged (skipped): {skipped}",
+    )
+    print(
+        f"\nCompleted. Total files: {len(all_files)} | Successes: {successes} | Errors: {errors}"
+        f" | Unchanged (skipped): {skipped}"
+    )
     return 0
 # // ------------------------------------------------------------
 
 
 if __name__ == "__main__":
+    # Needed for --processes in a PyInstaller-frozen exe (no-op otherwise)
+    multiprocessing.freeze_support()
     raise SystemExit(main())
 
 